@@ -0,0 +1,51 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    daq: {
+        /**
+         * Forwards the ticks of the refresh interval only while the page
+         * is visible, so that hidden tabs do not poll the server
+         */
+        forward_visible_tick: function(n_intervals) {
+            if (document.visibilityState === 'hidden') {
+                return window.dash_clientside.no_update;
+            }
+            return n_intervals;
+        },
+
+        /**
+         * Formats the elapsed DAQ time the same way as Python's
+         * str(datetime.timedelta(seconds=...)), e.g. '1 day, 2:03:04'
+         */
+        update_time_display: function(daq_values) {
+            var seconds = (daq_values && daq_values['time'] != null) ? Math.floor(daq_values['time']) : 0;
+            var days = Math.floor(seconds / 86400);
+            var hours = Math.floor(seconds % 86400 / 3600);
+            var minutes = Math.floor(seconds % 3600 / 60);
+            var time_delta = hours + ':' +
+                String(minutes).padStart(2, '0') + ':' +
+                String(seconds % 60).padStart(2, '0');
+            if (days) {
+                time_delta = days + (days > 1 ? ' days, ' : ' day, ') + time_delta;
+            }
+            return 'Run time: ' + time_delta;
+        },
+
+        /**
+         * Lists the last value of each measurement with its unit,
+         * the unit being the bracketed last word of the CSV key
+         */
+        update_last_daq_readings: function(daq_values) {
+            if (!daq_values) {
+                return '';
+            }
+            var lines = [];
+            for (var key in daq_values) {
+                if (key === 'time' || key === 'datetime') {
+                    continue;
+                }
+                var unit = key.slice(key.lastIndexOf(' ') + 1).slice(1, -1);
+                lines.push(Number(daq_values[key]).toFixed(4) + ' ' + unit);
+            }
+            return lines.join('\n');
+        }
+    }
+});
@@ -4,6 +4,7 @@ import signal
 import argparse
 import pandas as pd
 import pint
+from utils.virtual_device import write_value
 
 class Controller:
     """
@@ -86,7 +87,7 @@ class Controller:
 
         # Check that the quantity is an entry in the file
         self._quantity = args.quantity
-        if self._quantity not in pd.read_csv(self._device).keys():
+        if self._quantity not in pd.read_csv(self._device, dtype=float).keys():
             raise KeyError('Could not find quantity {} under the device file {}'.\
                                                     format(self._quantity, self._device))
 
@@ -126,7 +127,7 @@ class Controller:
         """
         for i in range(self._max_fails):
             try:
-                device = pd.read_csv(self._device)
+                device = pd.read_csv(self._device, dtype=float)
                 return float(device[self._quantity].iloc[-1])
             except Exception as e:
                 if not self.handle_fail(e, i+1, 'read'):
@@ -138,12 +139,11 @@ class Controller:
         """
         for i in range(self._max_fails):
             try:
-                device = pd.read_csv(self._device)
-                device[self._quantity].iloc[-1] = value
-                device.to_csv(self._device, index=False)
+                # Only replace the quantity in the last line of the device file
+                write_value(self._device, self._quantity, value)
                 break
             except Exception as e:
-                if not self.handle_fail(e, i+1, 'read'):
+                if not self.handle_fail(e, i+1, 'set'):
                     return None
 
     def control(self):
@@ -160,10 +160,16 @@ class Controller:
             if value == self._value:
                 break
 
-            # Increment the value, wait if necessary
+            # Increment the value, wait if necessary (a signal does not interrupt
+            # time.sleep, so sleep in short slices to stop promptly when killed)
             value += min(self._step, self._value-value, key=abs)
             print('Sleep for {} seconds'.format(self._time))
-            time.sleep(self._time)
+            wake_time = time.monotonic() + self._time
+            while not killer.kill_now:
+                remaining = wake_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(0.1, remaining))
 
 if __name__ == '__main__':
 
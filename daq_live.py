@@ -1,13 +1,17 @@
 import os
 import dash
+import importlib.util
 import argparse
 
 # Check that the DAQ environment has been set
 if 'DAQ_BASEDIR' not in os.environ:
     raise KeyError('DAQ environment not set up, please source setup.sh')
 
+# Compress the responses of the server if flask_compress is available
+compress = importlib.util.find_spec('flask_compress') is not None
+
 # Initialize the app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, compress=compress)
 server = app.server
 
 # Import the layout of the application
@@ -1,26 +1,34 @@
+import os
+import importlib.util
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import sys
 
+# Use the multithreaded pyarrow CSV parser if it is available
+engine = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
 # Get the data file
 if 'csv' not in sys.argv[-1]:
     raise Exception('Please specify a csv file in the command line')
 
 # Import the data content with pandas
-name = sys.argv[-1].split('/')[-1].split('.')[0]
-data = pd.read_csv(sys.argv[-1])
+name = os.path.basename(sys.argv[-1]).split('.')[0]
+keys = [key for key in pd.read_csv(sys.argv[-1], nrows=0).columns if key != 'datetime']
+data = pd.read_csv(sys.argv[-1], engine=engine, dtype=np.float64, usecols=keys)
 
 # Initialize the relative time array
-init_time = np.full(data.shape[0], data['time'][0])
-time = data['time'] - init_time
+time = data['time'].to_numpy() - data['time'].iat[0]
 
-# Draw all quantities as a function of time
+# Draw all quantities as a function of time, reuse a single figure
+fig, ax = plt.subplots()
 for key in data.keys():
     if 'time' in key:
-        
         continue
-    plt.plot(time, data[key])
-    plt.xlabel('Time [s]')
-    plt.ylabel(key)
-    plt.savefig('output/'+name+'_'+key.split(' [')[0].lower()+'.pdf')
+    ax.clear()
+    ax.plot(time, data[key].to_numpy())
+    ax.set_xlabel('Time [s]')
+    ax.set_ylabel(key)
+    fig.savefig('output/'+name+'_'+key.split(' [')[0].lower()+'.pdf')
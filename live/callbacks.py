@@ -1,13 +1,9 @@
 import os
 import time
-import yaml
-import signal
+import contextlib
 import subprocess
 import datetime
-import numpy as np
-import pandas as pd
-from dash import html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 from dash.exceptions import PreventUpdate
 from live.utils import *
 
@@ -31,22 +27,22 @@ def register_callbacks(app):
         # If no DAQ process is running, start one
         if not daqpid:
             # Check that there isn't already a running processes
-            pids = find_process('daq.py')
+            pids = find_process('daq.py', max_age=0)
             if len(pids):
                 return str(pids[-1]), True, False
 
-            # Count the amount of files currently in the data directory
-            n_files = len(os.listdir(os.environ['DAQ_DATDIR']))
-
-            # Start the DAQ process
-            args = ['exec', 'python3', os.environ['DAQ_BASEDIR']+'/daq.py', '--config', cfg_name, '--name', out_name]
-            daqpid = subprocess.Popen(' '.join(args), shell=True).pid
+            # Watch the data directory before starting the DAQ so no file creation is missed
+            with DirectoryWatcher(os.environ['DAQ_DATDIR']) as watcher:
+                # Start the DAQ process in its own session (the DAQ writes its own log)
+                args = ['python3', os.environ['DAQ_BASEDIR']+'/daq.py', '--config', cfg_name, '--name', out_name]
+                daqpid = subprocess.Popen(args, start_new_session=True).pid
 
-            # Wait for the program to produce a new data file, as long as it is alive
-            while len(os.listdir(os.environ['DAQ_DATDIR'])) == n_files:
-                if not process_is_live(daqpid):
-                    return '', False, True
-                time.sleep(0.1)
+                # Wait for the program to produce a new data file, as long as it is alive.
+                # Give up waiting after a minute, the interval checks the DAQ status anyway
+                deadline = time.monotonic() + 60
+                while not watcher.wait(0.2) and time.monotonic() < deadline:
+                    if not process_is_live(daqpid):
+                        return '', False, True
 
             # Disable the start button
             return str(daqpid), True, False
@@ -55,28 +51,16 @@ def register_callbacks(app):
         else:
             # If there is a controller job underway, kill it and wait for it to die
             if contpid:
-                try:
-                    os.kill(int(contpid), signal.SIGTERM)
-                    while process_is_live(pid):
-                        time.sleep(0.1)
-                    time.sleep(0.1)
-                except:
-                    pass
+                kill_process(contpid)
 
             # Send a kill signal to the DAQ, wait for it to die
-            try:
-                os.kill(int(daqpid), signal.SIGTERM)
-                while process_is_live(daqpid):
-                    time.sleep(0.1)
-                time.sleep(0.1)
-            except:
-                pass
-
-            # Delete the virtual devices
-            dev_dir = os.environ['DAQ_DEVDIR']
-            dev_files = [os.path.join(dev_dir, f) for f in os.listdir(dev_dir)]
-            for dev in dev_files:
-                os.remove(dev)
+            kill_process(daqpid)
+
+            # Delete the virtual devices (may race with the DAQ shutdown)
+            with os.scandir(os.environ['DAQ_DEVDIR']) as entries:
+                for entry in entries:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(entry.path)
 
             # Disable the stop button, disable autorefresh
             return '', False, True
@@ -92,10 +76,20 @@ def register_callbacks(app):
         return not bool(pid)
 
 
+    # The display refreshes follow the interval ticks only while the page is
+    # visible in the browser (assets/clientside.js), the status checks do not
+    app.clientside_callback(
+        ClientsideFunction(namespace='daq', function_name='forward_visible_tick'),
+        Output('store-visible-tick', 'data'),
+        [Input('interval-update', 'n_intervals')]
+    )
+
+
     @app.callback(Output('button-stop-daq', 'n_clicks'),
                   [Input('interval-update', 'n_intervals')],
                   [State('store-daq-id', 'data'),
                    State('button-stop-daq', 'n_clicks')])
+    @skip_if_busy
     def check_daq_status(_, pid, nstop):
         '''
         App callback that automatically presses the stop
@@ -111,6 +105,7 @@ def register_callbacks(app):
                   [Input('interval-update', 'n_intervals')],
                   [State('store-daq-id', 'data'),
                    State('button-start-daq', 'n_clicks')])
+    @skip_if_busy
     def update_daq_process(_, pid, nstart):
         '''
         App callback that looks for an already existing
@@ -148,9 +143,8 @@ def register_callbacks(app):
         App callback that displays the configuration dictionary
         '''
         if cfg_name:
-            with open(cfg_name, 'r') as cfg_file:
-                cfg = yaml.safe_load(cfg_file)
-                return yaml.dump(cfg), cfg['output_name']
+            cfg_stat = os.stat(cfg_name)
+            return load_config(cfg_name, cfg_stat.st_mtime_ns, cfg_stat.st_size)
 
         return '', ''
 
@@ -175,28 +169,22 @@ def register_callbacks(app):
         # If nset is larger than nstop, initialize the controller
         if nstop != nset:
             # Check that there isn't already a running processes
-            pids = find_process('controller.py')
+            pids = find_process('controller.py', max_age=0)
             if len(pids):
                 return str(pids[-1]), True, False
 
             # Start the Controller process
-            device = device.split('/')[-1]
-            args = ['exec', 'python3', os.environ['DAQ_BASEDIR']+'/controller.py', '--device', device,\
+            device = os.path.basename(device)
+            args = ['python3', os.environ['DAQ_BASEDIR']+'/controller.py', '--device', device,\
                 '--quantity', quantity, '--value', str(value), '--step', str(step), '--time', str(timeint)]
-            contpid = subprocess.Popen(' '.join(args), shell=True).pid
+            contpid = subprocess.Popen(args, start_new_session=True).pid
 
             # Disable the start button
             return str(contpid), True, False
         else:
             if contpid:
-                try:
-                    os.kill(int(contpid), signal.SIGTERM)
-                    while process_is_live(pid):
-                        time.sleep(0.1)
-                    time.sleep(0.1)
-                except:
-                    pass
-            daq_pids = find_process('daq.py')
+                kill_process(contpid)
+            daq_pids = find_process('daq.py', max_age=0)
             cont_disable = not bool(len(daq_pids))
             return '', cont_disable, True
 
@@ -262,9 +250,7 @@ def register_callbacks(app):
         dev_options = []
         dev_value = None
         if not daq_disable:
-            dev_dir = os.environ['DAQ_DEVDIR']
-            dev_files = [os.path.join(dev_dir, f) for f in os.listdir(dev_dir)]
-            dev_options = [{'label':f.split('/')[-1], 'value':f} for f in dev_files]
+            dev_options = file_options(os.environ['DAQ_DEVDIR'])
             if len(dev_options):
                 dev_value = dev_options[0]['value']
 
@@ -284,7 +270,7 @@ def register_callbacks(app):
         meas_options = []
         meas_value = None
         if device_name:
-            meas_keys = pd.read_csv(device_name).keys()
+            meas_keys = read_daq_header(device_name)
             meas_options = [{'label':k, 'value':k} for k in meas_keys]
             if len(meas_options):
                 meas_value = meas_options[0]['value']
@@ -301,43 +287,38 @@ def register_callbacks(app):
         data files when the DAQ has created a log file
         '''
         # Update the list of data files, set the last DAQ output as current
-        data_dir = os.environ['DAQ_DATDIR']
-        data_files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.csv')]
-        data_file = None
-        if len(data_files):
-            data_files.sort()
-            data_file = data_files[-1]
-        data_options = [{'label':f.split('/')[-1], 'value':f} for f in data_files]
+        data_files = [f for f in list_dir(os.environ['DAQ_DATDIR']) if f[0].endswith('.csv')]
+        data_file = data_files[-1][1] if len(data_files) else None
+        data_options = [{'label':name, 'value':path} for name, path in data_files]
         return data_options, data_file
 
 
     @app.callback([Output('store-daq-keys', 'data')],
-                  [Input('interval-update', 'n_intervals'),
-                   Input('dropdown-file-selection', 'value')])
-    def update_data_keys(_, daq_file):
+                  [Input('store-visible-tick', 'data'),
+                   Input('dropdown-file-selection', 'value')],
+                  [State('store-daq-keys', 'data')])
+    def update_data_keys(_, daq_file, stored_keys):
         '''
         App callback that reads the CSV data file header
         when the file dropdown changes to update the keys
         '''
+        daq_keys = []
         if daq_file:
             try:
                 # Check that the DAQ file minimally contains a time column
-                daq_df = pd.read_csv(daq_file, nrows=1)
-                daq_keys = daq_df.keys().to_list()
-                if 'time' not in daq_keys:
+                header = read_daq_header(daq_file)
+                if len(header) and 'time' not in header:
                     print('No time stamps in the data, must provide a \'time\' column')
-                    return []
-                daq_keys.remove('time')
-                if 'datetime' in daq_keys:
-                    daq_keys.remove('datetime')
-
-                return [daq_keys]
+                else:
+                    daq_keys = [key for key in header if key not in ['time', 'datetime']]
             except FileNotFoundError:
                 print('File not found: {}'.format(daq_file))
-            except pd.errors.EmptyDataError as error:
-                pass
 
-        return [[]]
+        # Only update the keys if they changed, the graph refreshes on its own
+        if daq_keys == stored_keys:
+            raise PreventUpdate
+
+        return [daq_keys]
 
 
     @app.callback([Output('checklist-display-options-daq', 'options'),
@@ -351,112 +332,113 @@ def register_callbacks(app):
         when the file changes, necessary as not all files
         contain the same measurements
         '''
+        # Leave the options and the user selection untouched if the keys did not change
+        if disp_options is not None and [o['value'] for o in disp_options] == (daq_keys or []):
+            raise PreventUpdate
+
         if daq_keys:
             options = [{'label': ' '+key_elements(key)[0], 'value': key} for key in daq_keys]
-            if options == disp_options:
-                return disp_options, disp_values
-
             return options, daq_keys
 
         return [], []
 
 
-    @app.callback(Output('text-log', 'value'),
-                  [Input('interval-update', 'n_intervals'),
-                   Input('store-daq-id', 'data')])
-    def update_log_file(_, __):
+    @app.callback([Output('text-log', 'value'),
+                   Output('store-log-path', 'data')],
+                  [Input('store-visible-tick', 'data'),
+                   Input('store-daq-id', 'data')],
+                  [State('store-log-path', 'data')])
+    def update_log_file(_, __, log_signature):
         '''
         App callback that updates the log file displayed
         when the page is refreshed
         '''
-        log_dir = os.environ['DAQ_LOGDIR']
-        log_files = [os.path.join(log_dir, f) for f in os.listdir(log_dir)]
-        log_file = None
-        if len(log_files):
-            log_files.sort()
-            log_file = log_files[-1]
-        if log_file:
-            with open(log_file, 'r') as log:
-                message = 'Displaying log {}\n\n'.format(log_file)
-                return message+''.join(log.readlines())
-        else:
-            return 'DAQ log will appear here when available...'
+        # Only update the log if it changed since it was last sent to this page
+        log_files = list_dir(os.environ['DAQ_LOGDIR'])
+        if not len(log_files):
+            return 'DAQ log will appear here when available...', []
+
+        log_file = log_files[-1][1]
+        size = os.stat(log_file).st_size
+        if log_signature == [log_file, size]:
+            raise PreventUpdate
+
+        # Only keep the tail of the log, the text box cannot show more anyway
+        log, truncated = read_log_tail(log_file, size)
+        message = 'Displaying log {}\n\n'.format(log_file)
+        if truncated:
+            message += '... (truncated)\n'
+
+        return message+log, [log_file, size]
 
 
-    @app.callback([Output('div-graph-daq', 'children'),
-                   Output('store-daq-values', 'data')],
+    @app.callback([Output('graph-daq', 'figure'),
+                   Output('store-daq-values', 'data'),
+                   Output('store-graph-signature', 'data')],
                   [Input('radio-display-mode-daq', 'value'),
                    Input('checklist-display-options-daq', 'value'),
                    Input('input-time-range', 'value'),
-                   Input('dropdown-time-range', 'value')],
-                  [State('store-daq-keys', 'data'),
-                   State('dropdown-file-selection', 'value')])
-    def update_div_graph(display_mode, checklist_display_options, time_value, time_unit, daq_keys, daq_file):
+                   Input('dropdown-time-range', 'value'),
+                   Input('store-daq-keys', 'data'),
+                   Input('dropdown-file-selection', 'value'),
+                   Input('store-visible-tick', 'data')],
+                  [State('store-graph-signature', 'data')])
+    def update_div_graph(display_mode, checklist_display_options, time_value, time_unit,
+                         daq_keys, daq_file, _, graph_signature):
         '''
         App callback that updates the graph
         whenever the page is refreshed
         '''
+        # The keys may still be those of the previous file, only keep the ones in this file
+        if daq_file and daq_keys:
+            header = read_daq_header(daq_file)
+            daq_keys = [key for key in daq_keys if key in header]
+
         # If there are no daq_keys, return blank graph
-        if daq_keys is None or not len(daq_keys):
-            return (update_graph(None, [], '', '')), {}
+        if not daq_file or not daq_keys:
+            return (update_graph(None, [], '', '')), {}, None
+
+        # Do not rebuild the graph if neither the file nor the display changed. The
+        # modification time is stored as a string, as the browser would round it
+        daq_stat = os.stat(daq_file)
+        signature = [daq_file, daq_stat.st_size, str(daq_stat.st_mtime_ns), daq_keys,
+                     display_mode, checklist_display_options, time_value, time_unit]
+        if signature == graph_signature:
+            raise PreventUpdate
 
-        # Read in the datafile
-        daq_df = pd.read_csv(daq_file)
+        # Read in the datafile, return blank graph if it does not contain data yet
+        daq_df = read_daq_file(daq_file, daq_keys)
+        if daq_df is None:
+            return (update_graph(None, [], '', '')), {}, None
 
-        # Restrict the range of time to the requested interval
+        # Restrict the range of time to the requested interval (time stamps are sorted)
         starttime = daq_df['time'].iloc[0]
         time_int = datetime.timedelta(**{time_unit:time_value}).total_seconds()
-        daq_df = daq_df[daq_df['time'].iloc[-1]-daq_df['time'] < time_int]
-        daq_values = {key:daq_df[key].iloc[-1] for key in daq_df.keys()}
+        start = daq_df['time'].searchsorted(daq_df['time'].iloc[-1]-time_int, side='right')
+        daq_df = daq_df.iloc[start:]
+        daq_values = daq_df.iloc[-1].to_dict()
 
         # If there is no datetime column in the file (older files), add it
-        if 'datetime' not in daq_df.keys():
+        # to a copy of the window, the cached dataframe is left untouched
+        if 'datetime' not in daq_df.columns:
+            daq_df = daq_df.copy()
             get_datetimes(daq_file, daq_df, starttime)
-        else:
-            daq_df['datetime'] = pd.to_datetime(daq_df['datetime'], format='%Y-%m-%d_%H-%M-%S.%f')
 
-        # Update the graph
-        graph = update_graph(daq_df, daq_keys, display_mode, checklist_display_options)
-        return [graph], daq_values
+        # Update the graph figure, the graph component itself is static
+        figure = update_graph(daq_df, daq_keys, display_mode, checklist_display_options)
+        return figure, daq_values, signature
 
 
-    @app.callback(Output('div-time-display', 'children'),
-                  [Input('store-daq-values', 'data')])
-    def update_div_time_display(daq_values):
-        '''
-        App callback that prints the elapsed time
-        whenever the page is refreshed
-        '''
-        # If the DAQ is running, get the elapsed time
-        elapsed_time = 0
-        if daq_values:
-            elapsed_time = int(daq_values['time'])
-
-        time_delta = str(datetime.timedelta(seconds=elapsed_time))
-        return html.H6(f"Run time: {time_delta}",
-                       style={'font-weight': 'bold',
-                              'margin-top': '3px'})
-
+    # The elapsed time and the last readings are formatted in the browser
+    # (assets/clientside.js), they only depend on the small store-daq-values
+    app.clientside_callback(
+        ClientsideFunction(namespace='daq', function_name='update_time_display'),
+        Output('text-time-display', 'children'),
+        [Input('store-daq-values', 'data')]
+    )
 
-    @app.callback(Output('div-last-daq-value', 'children'),
-                  [Input('store-daq-values', 'data')])
-    def update_div_last_daq_readings(daq_values):
-        '''
-        App callback that prints the current values of the measurements
-        whenever the page is refreshed
-        '''
-        div = [html.H6("Last readings",
-                         style={'font-weight': 'bold',
-                                'margin-bottom': '0px'}
-                        )]
-        if daq_values:
-            values = []
-            for key, value in daq_values.items():
-                if key == 'time' or key == 'datetime': continue
-                name, unit = key_elements(key)
-                val = daq_values[key]
-                values.append(html.Div(f"{val:.4f} {unit}",
-                    style={'margin-left': '5px', 'font-weight':'bold'}))
-            div += values
-
-        return div
+    app.clientside_callback(
+        ClientsideFunction(namespace='daq', function_name='update_last_daq_readings'),
+        Output('text-last-daq-value', 'children'),
+        [Input('store-daq-values', 'data')]
+    )
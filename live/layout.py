@@ -1,7 +1,7 @@
 import os
-import sys
 import dash_daq as daq
 from dash import dcc, html
+from live.utils import file_options
 
 def div_graph_daq():
     """
@@ -11,6 +11,7 @@ def div_graph_daq():
     return html.Div([
         # Graph division
         html.Div(
+            dcc.Graph(id='graph-daq'),
             id='div-graph-daq',
             className='nine columns',
             style={'margin-left': '10px'}
@@ -60,6 +61,11 @@ def div_graph_daq():
 
             # Box that shows the elapsed time
             html.Div(
+                html.H6(
+                    id='text-time-display',
+                    style={'font-weight': 'bold',
+                           'margin-top': '3px'}
+                ),
                 id="div-time-display",
                 style={'margin-top': '10px'}
             ),
@@ -97,8 +103,20 @@ def div_graph_daq():
                 ],
                 className='six columns'),
 
-                html.Div(id='div-last-daq-value',
-                         className='six columns')
+                html.Div([
+                    html.H6("Last readings", style={'font-weight': 'bold',
+                                                    'margin-bottom': '0px'}),
+
+                    html.Div(
+                        id='text-last-daq-value',
+                        style={'margin-left': '5px',
+                               'font-weight': 'bold',
+                               'white-space': 'pre-line'}
+                    )
+                ],
+                    id='div-last-daq-value',
+                    className='six columns'
+                )
             ],
                 className='row',
                 style={'margin-top': '0px',
@@ -109,14 +127,8 @@ def div_graph_daq():
             className='three columns'
         ),
     ],
-        className="row",
-        style={
-            "border-radius": "5px",
-            "border-width": "5px",
-            "border": "2px solid rgb(216, 216, 216)",
-            "position": "relative",
-            "height": "480px"
-        }
+        className="row daq-panel",
+        style={"height": "480px"}
     )
 
 
@@ -125,8 +137,7 @@ def div_daq_controls():
     Generates an HMTL Div containing the DAQ controls
     """
     config_dir = os.environ['DAQ_CFGDIR']
-    config_files = [os.path.join(config_dir, f) for f in os.listdir(config_dir)]
-    config_options = [{'label':f.split('/')[-1], 'value':f} for f in config_files]
+    config_options = file_options(config_dir, '.yaml')
     return html.Div([
 
         # Title
@@ -138,26 +149,16 @@ def div_daq_controls():
             daq.StopButton(
                 id='button-start-daq',
                 children='Start',
-                className='one column',
-                disabled=False,
-                style={
-                    "display": "flex",
-                    "justify-content": "center",
-                    "width": "49%",
-                }
+                className='one column daq-button',
+                disabled=False
             ),
 
             # Button that stops the DAQ
             daq.StopButton(
                 id='button-stop-daq',
                 children='Stop',
-                className='one column',
-                disabled=True,
-                style={
-                    "display": "flex",
-                    "justify-content": "center",
-                    "width": "49%",
-                }
+                className='one column daq-button',
+                disabled=True
             ),
         ]),
 
@@ -183,18 +184,12 @@ def div_daq_controls():
             dcc.Dropdown(
                 id='dropdown-config-selection',
                 options=config_options,
-                value=config_dir+'/config_default.yaml',
-                className='twelve columns',
+                value=os.path.join(config_dir, 'config_default.yaml'),
+                className='twelve columns daq-dropdown',
                 clearable=False,
                 searchable=False,
                 disabled=False,
-                style={
-                    "display": "flex",
-                    "justify-content": "center",
-                    "width": "90%",
-                    'margin-top': '5px',
-                    'margin-left': "5%"
-                }
+                style={'margin-top': '5px'}
             ),
 
             # Box that display the config file
@@ -215,12 +210,8 @@ def div_daq_controls():
             dcc.Store(id='store-daq-id')
         ])
     ],
-        className="three columns",
+        className="three columns daq-panel",
         style={
-            "border-radius": "5px",
-            "border-width": "5px",
-            "border": "2px solid rgb(216, 216, 216)",
-            "position": "relative",
             "height": "400px",
             "margin-top": "10px",
             "margin-left": "0px"
@@ -246,26 +237,16 @@ def div_device_controls():
                 daq.StopButton(
                     id='button-set-device',
                     children='Set',
-                    className='one column',
-                    disabled=True,
-                    style={
-                        "display": "flex",
-                        "justify-content": "center",
-                        "width": "49%",
-                    }
+                    className='one column daq-button',
+                    disabled=True
                 ),
 
                 # Button that stops the iterative setting of the device
                 daq.StopButton(
                     id='button-stop-device',
                     children='Stop',
-                    className='one column',
-                    disabled=True,
-                    style={
-                        "display": "flex",
-                        "justify-content": "center",
-                        "width": "49%",
-                    }
+                    className='one column daq-button',
+                    disabled=True
                 )
             ]),
 
@@ -273,36 +254,24 @@ def div_device_controls():
             dcc.Dropdown(
                 id='dropdown-device-selection',
                 options=[],
-                className='twelve columns',
+                className='twelve columns daq-dropdown',
                 clearable=False,
                 searchable=False,
                 disabled=True,
                 placeholder='Select the device to control',
-                style={
-                    "display": "flex",
-                    "justify-content": "center",
-                    "width": "90%",
-                    'margin-top': '25px',
-                    'margin-left': "5%"
-                }
+                style={'margin-top': '25px'}
             ),
 
             # DAQ device dropdown selector
             dcc.Dropdown(
                 id='dropdown-meas-selection',
                 options=[],
-                className='twelve columns',
+                className='twelve columns daq-dropdown',
                 clearable=False,
                 searchable=False,
                 disabled=True,
                 placeholder='Select the quantity to set',
-                style={
-                    "display": "flex",
-                    "justify-content": "center",
-                    "width": "90%",
-                    'margin-top': '5px',
-                    'margin-left': "5%"
-                }
+                style={'margin-top': '5px'}
             ),
 
             # Div with the value input and the start value
@@ -311,21 +280,14 @@ def div_device_controls():
                 daq.NumericInput(
                     id='input-device-value',
                     value=0,
-                    min=-sys.float_info.max,
-                    max=sys.float_info.max,
+                    min=-1e9,
+                    max=1e9,
                     size=80,
                     label='Value',
                     labelPosition='top',
-                    className='six columns',
+                    className='six columns daq-numeric',
                     disabled=True,
-                    style={
-                        "display": "flex",
-                        "justify-content": "center",
-                        "align-items": "center",
-                        "width": "25%",
-                        "margin-top": "10px",
-                        "margin-left": "10%"
-                    }
+                    style={"margin-left": "10%"}
                 )
             ]),
 
@@ -336,19 +298,12 @@ def div_device_controls():
                     id='input-device-step',
                     value=0,
                     min=0,
-                    max=sys.float_info.max,
+                    max=1e9,
                     size=80,
                     label='Step',
                     labelPosition='top',
-                    className='six columns',
-                    disabled=True,
-                    style={
-                        "display": "flex",
-                        "justify-content": "center",
-                        "align-items": "center",
-                        "width": "25%",
-                        "margin-top": "10px"
-                    }
+                    className='six columns daq-numeric',
+                    disabled=True
                 ),
 
                 # Input box with the time to wait between each value to set
@@ -360,16 +315,9 @@ def div_device_controls():
                     size=80,
                     label='Time',
                     labelPosition='top',
-                    className='four columns',
+                    className='four columns daq-numeric',
                     disabled=True,
-                    style={
-                        "display": "flex",
-                        "justify-content": "center",
-                        "align-items": "center",
-                        "width": "25%",
-                        "margin-top": "10px",
-                        "margin-bottom": "40px"
-                    }
+                    style={"margin-bottom": "40px"}
                 )
 
             ]),
@@ -382,12 +330,8 @@ def div_device_controls():
             style={'margin-top': 10}
         )
     ],
-        className="three columns",
+        className="three columns daq-panel",
         style={
-            "border-radius": "5px",
-            "border-width": "5px",
-            "border": "2px solid rgb(216, 216, 216)",
-            "position": "relative",
             "height": "400px",
             "margin-top": "10px"
         }
@@ -422,17 +366,13 @@ def div_daq_log():
             )
         ]),
 
-        # Invisible div that stores the path to the log file
+        # Invisible div that stores the path and size of the displayed log file
         dcc.Store(
             id='store-log-path'
         )
     ],
-        className="six columns",
+        className="six columns daq-panel",
         style={
-            "border-radius": "5px",
-            "border-width": "5px",
-            "border": "2px solid rgb(216, 216, 216)",
-            "position": "relative",
             "height": "400px",
             "margin-top": "10px",
             "margin-right": "0px",
@@ -473,10 +413,16 @@ layout = html.Div([
             n_intervals=0
         ),
 
+        # Invisible div that forwards the interval ticks while the page is visible
+        dcc.Store(id='store-visible-tick'),
+
         # Invisible div that stores the JSON-serialized dataframe of DAQ data
         dcc.Store(id='store-daq-keys'),
         dcc.Store(id='store-daq-values'),
 
+        # Invisible div that stores the state of the data displayed in the graph
+        dcc.Store(id='store-graph-signature'),
+
         # Html div that stores the DAQ graph and display parameters
         div_graph_daq(),
 
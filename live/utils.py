@@ -1,12 +1,43 @@
+import io
 import os
+import atexit
+import collections
+import time
+import threading
+import yaml
+import functools
+import signal
+import select
 import psutil
-import datetime
 import numpy as np
 import pandas as pd
-from plotly import subplots
-import plotly.graph_objs as go
-from dash import dcc
+from dash.exceptions import PreventUpdate
 
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+def skip_if_busy(callback):
+    '''
+    Decorator that drops a call to a callback, raising PreventUpdate,
+    while a previous call to the same callback is still running
+    '''
+    lock = threading.Lock()
+
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        if not lock.acquire(blocking=False):
+            raise PreventUpdate
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            lock.release()
+
+    return wrapper
+
+
+@functools.lru_cache(maxsize=256)
 def key_elements(key):
     '''
     Function that gets the name and unit from the CSV key
@@ -16,50 +47,334 @@ def key_elements(key):
     return name, unit
 
 
-def find_process(name):
+# Use the libyaml bindings to parse and display configuration files, if available
+YAMLLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAMLDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+@functools.lru_cache(maxsize=32)
+def load_config(cfg_name, mtime_ns, size):
     '''
-    Function that finds existing python processes with name
+    Function that loads a configuration file and returns its dump and
+    output name. The modification time and size invalidate the cache
     '''
+    with open(cfg_name, 'r') as cfg_file:
+        cfg = yaml.load(cfg_file, Loader=YAMLLoader)
+        return yaml.dump(cfg, Dumper=YAMLDumper), cfg['output_name']
+
+
+# Time and result of the last process searches, indexed by name
+_found_processes = {}
+
+def find_process(name, max_age=0.5):
+    '''
+    Function that finds existing python processes with name. The
+    result of a search younger than max_age seconds is reused
+    '''
+    cache = _found_processes.get(name)
+    if cache is not None and time.monotonic() - cache[0] < max_age:
+        return list(cache[1])
+
+    # Fetch the attributes of each process in a single pass (psutil
+    # sets them to None for processes that are gone or inaccessible)
     pids = []
-    for proc in psutil.process_iter():
-        if proc.name() == 'python3':
-            proc_dict = proc.as_dict(['pid', 'cmdline'])
-            pid = None
-            for string in proc_dict['cmdline']:
-                if name in string:
-                    pid = proc_dict['pid']
-                    break
-            if pid:
-                pids.append(pid)
+    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+        info = proc.info
+        if info['name'] == 'python3' and any(name in s for s in info['cmdline'] or ()):
+            pids.append(info['pid'])
 
-    return pids
+    _found_processes[name] = (time.monotonic(), pids)
+    return list(pids)
 
 
+# Process file descriptors of the processes checked so far, indexed by PID
+_pidfds = {}
+_pidfds_lock = threading.Lock()
+
+@atexit.register
+def close_pidfds():
+    '''
+    Closes the process file descriptors still held when the app shuts down
+    '''
+    with _pidfds_lock:
+        for fd in _pidfds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        _pidfds.clear()
+
 def process_is_live(pid):
     '''
     Function that checks if a process is live
     '''
+    # A process file descriptor becomes readable once the process has exited
+    pid = int(pid)
+    if hasattr(os, 'pidfd_open'):
+        with _pidfds_lock:
+            try:
+                if pid not in _pidfds:
+                    _pidfds[pid] = os.pidfd_open(pid)
+                if not select.select([_pidfds[pid]], [], [], 0)[0]:
+                    return True
+                os.close(_pidfds.pop(pid))
+                return False
+            except ProcessLookupError:
+                return False
+            except OSError:
+                pass
+
+    # Otherwise, probe the process without sending a signal
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    # A zombie process still exists, check its state directly in /proc if available
     try:
-       proc = psutil.Process(int(pid))
-       if proc.status() == psutil.STATUS_ZOMBIE:
-           return False
-       else:
-           return True
-    except psutil.NoSuchProcess:
+        if not os.path.isdir('/proc'):
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        with open('/proc/{}/stat'.format(pid), 'rb') as stat:
+            return stat.read().rsplit(b')', 1)[1].split()[0] != b'Z'
+    except (FileNotFoundError, psutil.NoSuchProcess):
         return False
 
 
-def kill_process(pid):
+def kill_process(pid, timeout=5.):
     '''
-    Kills a process and wait for it to be dead
+    Kills a process and waits for at most timeout seconds for it to be
+    dead. Blocks on a process file descriptor when the platform has them,
+    relies on psutil otherwise (waitpid for a child, backed-off polling if not)
     '''
+    # Take over the descriptor cached by process_is_live, if any, so
+    # that it is closed here rather than kept for the life of the app
+    pid = int(pid)
+    with _pidfds_lock:
+        pidfd = _pidfds.pop(pid, None)
+    if pidfd is None:
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return
+        except (AttributeError, OSError):
+            pidfd = None
+
     try:
-        os.kill(int(pid), signal.SIGTERM)
-        while process_is_live(pid):
-            time.sleep(0.1)
-        time.sleep(0.1)
-    except:
+        if pidfd is not None:
+            signal.pidfd_send_signal(pidfd, signal.SIGTERM)
+            select.select([pidfd], [], [], timeout)
+        else:
+            os.kill(pid, signal.SIGTERM)
+            psutil.Process(pid).wait(timeout)
+    except (OSError, psutil.Error):
+        # The process is gone, belongs to another user or did not stop in time
         pass
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+# Sorted entries of the directories listed so far, indexed by path
+_directories = {}
+
+def list_dir(path):
+    '''
+    Function that returns the sorted (name, path) pairs of the entries
+    of a directory. The listing is cached until the directory is modified
+    '''
+    mtime_ns = os.stat(path).st_mtime_ns
+    cache = _directories.get(path)
+    if cache is not None and cache[0] == mtime_ns:
+        return cache[1]
+
+    with os.scandir(path) as entries:
+        files = tuple(sorted((e.name, e.path) for e in entries))
+
+    # Do not cache a directory modified within the timestamp granularity
+    if time.time_ns() - mtime_ns > 1e9:
+        _directories[path] = (mtime_ns, files)
+
+    return files
+
+
+def file_options(path, extension=''):
+    '''
+    Function that returns the dropdown options corresponding to the
+    files of a directory, optionally of a given extension. Hidden files
+    (e.g. device files being rewritten) are not listed
+    '''
+    return [{'label':name, 'value':file_path} for name, file_path in list_dir(path)
+            if name.endswith(extension) and not name.startswith('.')]
+
+
+class DirectoryWatcher:
+    '''
+    Context manager that waits for new files to appear in a directory.
+    Uses inotify when available, falls back on polling the directory otherwise
+    '''
+    def __init__(self, path):
+        self._path    = path
+        self._inotify = None
+        self._mtime_ns = 0
+
+    def __enter__(self):
+        if INotify is not None:
+            self._inotify = INotify()
+            self._inotify.add_watch(self._path, flags.CREATE | flags.MOVED_TO)
+        else:
+            self._mtime_ns = os.stat(self._path).st_mtime_ns
+        return self
+
+    def __exit__(self, *args):
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def wait(self, timeout):
+        '''
+        Waits for at most timeout seconds, returns True if a new file appeared
+        '''
+        if self._inotify is not None:
+            return len(self._inotify.read(timeout=int(1000*timeout))) > 0
+
+        time.sleep(timeout)
+        return os.stat(self._path).st_mtime_ns != self._mtime_ns
+
+
+# Content of the last DAQ data files read, indexed by path
+_daq_files = collections.OrderedDict()
+_daq_files_lock = threading.Lock()
+_daq_files_max = 8
+
+def read_daq_file(daq_file, daq_keys):
+    '''
+    Function that loads the time, datetime and measurement
+    columns of a DAQ data file into a dataframe. The content
+    is cached, only the rows appended since the last call
+    are parsed (datetimes included). Returns None if the
+    file has no data rows yet
+    '''
+    with _daq_files_lock:
+        # Nothing to do if the size and modification time of the file did not change
+        daq_stat = os.stat(daq_file)
+        size, signature = daq_stat.st_size, (daq_stat.st_size, daq_stat.st_mtime_ns)
+        cache = _daq_files.get(daq_file)
+        if cache is not None and cache['signature'] == signature and cache['keys'] == daq_keys:
+            _daq_files.move_to_end(daq_file)
+            return cache['df']
+
+        # Start from scratch if the file is new, was rewritten or if the keys changed
+        if cache is None or size < cache['offset'] or cache['keys'] != daq_keys:
+            cache = {'offset': 0, 'keys': list(daq_keys), 'names': None, 'df': None}
+
+        # Read the bytes appended since the last call
+        with open(daq_file, 'rb') as data:
+            data.seek(cache['offset'])
+            buf = data.read(size - cache['offset'])
+
+        # Only parse complete lines, a partially written row is read on the next call
+        start, end = 0, buf.rfind(b'\n') + 1
+        names, df = cache['names'], cache['df']
+        if names is None:
+            start = buf.find(b'\n') + 1
+            if not start:
+                return None
+            names = buf[:start].decode().strip().split(',')
+
+        if end > start:
+            dtypes = {key: np.float64 for key in ['time']+daq_keys}
+            new_df = pd.read_csv(io.BytesIO(buf[start:end]), header=None, names=names,
+                                 engine='c', dtype=dtypes,
+                                 usecols=lambda key: key in dtypes or key == 'datetime')
+            if 'datetime' in new_df:
+                new_df['datetime'] = pd.to_datetime(new_df['datetime'],
+                                                    format='%Y-%m-%d_%H-%M-%S.%f', cache=True)
+            df = new_df if df is None else pd.concat([df, new_df], ignore_index=True)
+
+        _daq_files[daq_file] = {'offset': cache['offset']+end, 'signature': signature,
+                                'keys': cache['keys'], 'names': names, 'df': df}
+        _daq_files.move_to_end(daq_file)
+        if len(_daq_files) > _daq_files_max:
+            _daq_files.popitem(last=False)
+
+        return df
+
+
+@functools.lru_cache(maxsize=8)
+def load_daq_header(daq_file, mtime_ns, size):
+    '''
+    Function that reads the column names from the first line of a
+    DAQ data file. The modification time and size invalidate the cache
+    '''
+    with open(daq_file, 'r') as data:
+        header = data.readline()
+    if not header.endswith('\n'):
+        return ()
+
+    return tuple(header.rstrip('\n').split(','))
+
+
+def read_daq_header(daq_file):
+    '''
+    Function that returns the column names of a DAQ data file. Reuses
+    the names parsed by read_daq_file if the file was not rewritten since.
+    Returns an empty list if the header is not fully written yet
+    '''
+    daq_stat = os.stat(daq_file)
+    with _daq_files_lock:
+        cache = _daq_files.get(daq_file)
+        if cache is not None and cache['names'] is not None \
+                and daq_stat.st_size >= cache['offset']:
+            return list(cache['names'])
+
+    return list(load_daq_header(daq_file, daq_stat.st_mtime_ns, daq_stat.st_size))
+
+
+# Tail of the last log files read, indexed by path
+_log_files = collections.OrderedDict()
+_log_files_lock = threading.Lock()
+_log_files_max = 4
+
+def read_log_tail(log_file, size, max_bytes=65536):
+    '''
+    Function that returns the last max_bytes of the first size bytes
+    of a log file and whether it was truncated. Only the bytes appended
+    since the last call are read, a truncated log starts on a full line
+    '''
+    with _log_files_lock:
+        # Start from the end of the file if it is new or was rewritten
+        cache = _log_files.get(log_file)
+        if cache is None or size < cache['end']:
+            offset = max(0, size-max_bytes)
+            cache = {'start': offset, 'end': offset, 'data': b''}
+
+        if size > cache['end']:
+            # A first read that skips the start of the log also fetches the
+            # byte before the skipped part, to tell if it ends on a full line
+            first = int(cache['end'] == cache['start'] > 0)
+            with open(log_file, 'rb') as log:
+                log.seek(cache['end']-first)
+                data = cache['data'] + log.read(size-cache['end']+first)
+
+            # Drop the oldest lines that do not fit in the buffer. Only cut
+            # through a line if it is the last one left in the buffer
+            start = cache['start'] - first
+            if len(data) > max_bytes or first:
+                cut = max(len(data)-max_bytes, first)
+                if data[cut-1:cut] != b'\n':
+                    line_start = data.find(b'\n', cut) + 1
+                    if 0 < line_start < len(data):
+                        cut = line_start
+                data, start = data[cut:], start+cut
+
+            cache = {'start': start, 'end': size, 'data': data}
+
+        _log_files[log_file] = cache
+        _log_files.move_to_end(log_file)
+        if len(_log_files) > _log_files_max:
+            _log_files.popitem(last=False)
+
+        return cache['data'].decode('utf-8', 'replace'), cache['start'] > 0
 
 
 def get_datetimes(daq_file,
@@ -74,12 +389,112 @@ def get_datetimes(daq_file,
     except ValueError:
         print('Could not create datetimes, will draw relative time')
         return False
-    times = np.array(daq_df['time'])
-    datetimes = [sdatetime + datetime.timedelta(seconds=t-starttime) for t in times]
-    daq_df['datetime'] = datetimes
+    times = daq_df['time'].to_numpy()
+    daq_df['datetime'] = sdatetime + pd.to_timedelta(times-starttime, unit='s')
     return True
 
 
+def lttb(x, y, n_out=2000):
+    '''
+    Function that returns the indices of the n_out points that best
+    represent the series (x, y) using the Largest-Triangle-Three-Buckets
+    algorithm. The first and the last points are always kept
+    '''
+    n_points = len(x)
+    if n_points <= n_out or n_out < 3:
+        return np.arange(n_points)
+
+    # Split the points between the first and the last into n_out-2 buckets
+    edges = np.linspace(1, n_points-1, n_out-1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n_points-1
+
+    # Compute the average of each bucket at once. The last bucket is
+    # compared to the last point rather than to the next bucket average
+    counts = np.diff(edges)[1:]
+    cx = np.append(np.add.reduceat(x[:-1], edges[:-1])[1:]/counts, x[-1]).tolist()
+    cy = np.append(np.add.reduceat(y[:-1], edges[:-1])[1:]/counts, y[-1]).tolist()
+
+    # In each bucket, keep the point that forms the largest triangle with
+    # the previously kept point and the average of the next bucket. Only
+    # this dependent selection remains in the loop
+    a = 0
+    for i, (start, end) in enumerate(zip(edges[:-1].tolist(), edges[1:].tolist())):
+        if end - start == 1:
+            a = start
+        else:
+            xa, ya = float(x[a]), float(y[a])
+            areas = np.abs((xa-cx[i])*(y[start:end]-ya) - (xa-x[start:end])*(cy[i]-ya))
+            a = start + int(areas.argmax())
+        indices[i+1] = a
+
+    return indices
+
+
+@functools.lru_cache(maxsize=16)
+def graph_layout(display_mode, keys, date_axis):
+    """
+    Function that defines the layout of the Dash graph. It only
+    depends on the display parameters, so it is cached
+
+    :param display_mode: 'separate_vertical', 'separate_horizontal' or 'overlap'
+    :param keys: tuple of keys to display
+    :param date_axis: True if the time is given in milliseconds since the epoch
+    :return: layout dictionary
+    """
+    n_keys = len(keys)
+    layout = {'margin': {'b':0, 't':30}}
+
+    # Relative times are labeled, absolute times are shown as dates
+    time_axis = {'type': 'date'} if date_axis else {'title': {'text': 'Time [s]'}}
+
+    # Separate the measurements in several vertical graphs which share the bottom x axis
+    if display_mode == 'separate_vertical':
+        spacing = 0.025
+        height = (1. - spacing*(n_keys-1))/n_keys
+        layout['showlegend'] = False
+        for i, key in enumerate(keys):
+            axis_id = str(i + 1) * (i > 0)
+            top = 1. - i*(height+spacing)
+            layout['xaxis'+axis_id] = {**time_axis, 'anchor': 'y'+axis_id, 'domain': [0., 1.]}
+            layout['yaxis'+axis_id] = {'anchor': 'x'+axis_id, 'domain': [top-height, top],
+                                       'title': {'text': key}}
+            if i < n_keys-1:
+                layout['xaxis'+axis_id].pop('title', None)
+                layout['xaxis'+axis_id].update(matches='x'+str(n_keys)*(n_keys > 1),
+                                               showticklabels=False)
+
+        return layout
+
+    # Separate the measurements in several horizontal graphs
+    elif display_mode == 'separate_horizontal':
+        spacing = 0.2/n_keys
+        width = (1. - spacing*(n_keys-1))/n_keys
+        layout['showlegend'] = False
+        for i, key in enumerate(keys):
+            axis_id = str(i + 1) * (i > 0)
+            left = i*(width+spacing)
+            layout['xaxis'+axis_id] = {**time_axis, 'anchor': 'y'+axis_id,
+                                       'domain': [left, left+width]}
+            layout['yaxis'+axis_id] = {'anchor': 'x'+axis_id, 'domain': [0., 1.],
+                                       'title': {'text': key}}
+
+        return layout
+
+    # Overlap the measurents on a single canvas
+    elif display_mode == 'overlap':
+        left_margin = (n_keys-1)*.05
+        layout['xaxis'] = {**time_axis, 'domain':[left_margin, 1]}
+        for i, key in enumerate(keys):
+            axis_name = 'yaxis' + str(i + 1) * (i > 0)
+            layout[axis_name] = {'position': i * 0.05,
+                                 'title': {'text': key}}
+            if i > 0:
+                layout[axis_name]['overlaying'] = 'y'
+
+        return layout
+
+
 def update_graph(daq_df,
                  daq_keys,
                  display_mode,
@@ -90,94 +505,47 @@ def update_graph(daq_df,
     :param daq_data: the json file containing the data
     :param display_mode: 'separate' or 'overlap'
     :param checklist_display_options: list of keys to display
-    :return: dcc Graph object containing the updated figures
+    :return: figure dictionary of the graph
     """
     # Check that there is data, return empty graph otherwise
     if daq_df is None or not daq_keys:
-        return dcc.Graph(id='graph-daq')
+        return {'data': [], 'layout': {}}
 
     # Import the data, get the keys, check that there is something to display
-    keys = []
-    for key in daq_keys:
-        if key in checklist_display_options:
-            keys.append(key)
+    selected = set(checklist_display_options)
+    keys = [key for key in daq_keys if key in selected]
     n_keys = len(keys)
     if not n_keys:
-        return dcc.Graph(id='graph-daq')
+        return {'data': [], 'layout': {}}
 
-    # Use time as the x axis
-    xaxis_title = 'Time [s]'
-    times = daq_df['time']
-    if 'datetime' in daq_df.keys():
-        xaxis_title = ''
-        times = daq_df['datetime']
+    # Use time as the x axis. Absolute times are sent as milliseconds since
+    # the epoch, which serialize much more compactly than date strings
+    times = daq_df['time'].to_numpy()
+    datetimes = None
+    if 'datetime' in daq_df.columns:
+        datetimes = daq_df['datetime'].to_numpy().astype('datetime64[ms]').astype(np.int64)
 
-    # Initialize a trace for each quantity measured by the DAQ
+    # Initialize a trace for each quantity measured by the DAQ. Each trace
+    # has its own subplot, except in overlap mode where they share the x axis.
+    # Only send as many points as the browser can reasonably display
+    values = daq_df[keys].to_numpy()
     traces = []
-    for key in keys:
-        values = daq_df[key]
-        name, unit = key_elements(key)
-
-        traces.append(go.Scattergl(
-            x=times,
-            y=values,
-            mode='lines',
-            name=name
-        ))
-
-    # Separate the measurements in several vertical graphs
-    if display_mode == 'separate_vertical':
-        figure = subplots.make_subplots(rows=max(1, n_keys),
-                                        cols=1,
-                                        print_grid=False,
-                                        shared_xaxes=True,
-                                        shared_yaxes=False,
-                                        vertical_spacing=0.025)
-
-        for i, trace in enumerate(traces):
-            figure.append_trace(trace, i+1, 1)
-
-        figure['layout']['margin'] = {'b':0, 't':30}
-        figure['layout']['showlegend'] = False
-        figure['layout']['xaxis{}'.format(len(keys))].update(title = xaxis_title)
-        for i, key in enumerate(keys):
-            figure['layout']['yaxis'+str(i+1)].update(title = key)
-
-    # Separate the measurements in several horizontal graphs
-    elif display_mode == 'separate_horizontal':
-        figure = subplots.make_subplots(rows=1,
-                                        cols=max(1, n_keys),
-                                        shared_yaxes=False,
-                                        print_grid=False)
-
-        for i, trace in enumerate(traces):
-            figure.append_trace(trace, 1, i+1)
-
-        figure['layout']['margin'] = {'b':0, 't':30}
-        figure['layout']['showlegend'] = False
-        for i, key in enumerate(keys):
-            figure['layout']['xaxis'+str(i+1)].update(title = xaxis_title)
-            figure['layout']['yaxis'+str(i+1)].update(title = key)
-
-    # Overlap the measurents on a single canvas
-    elif display_mode == 'overlap':
-        left_margin = (n_keys-1)*.05
-        layout_kwargs = {'xaxis':{'title': xaxis_title, 'domain':[left_margin, 1]},
-                         'margin': {'b':0, 't':30}}
-
-        for i, key in enumerate(keys):
-            axis_name = 'yaxis' + str(i + 1) * (i > 0)
-            yaxis = 'y' + str(i + 1) * (i > 0)
-            layout_kwargs[axis_name] = {'position': i * 0.05,
-                                        'title':key}
-
-            traces[i]['yaxis'] = yaxis
-            if i > 0:
-                layout_kwargs[axis_name]['overlaying'] = 'y'
+    for i, key in enumerate(keys):
+        name = key_elements(key)[0]
+        idx = lttb(times, values[:, i])
 
-        figure = go.Figure(
-                    data=traces,
-                    layout=go.Layout(layout_kwargs)
-                 )
+        axis_id = str(i + 1) * (i > 0)
+        traces.append({
+            'type': 'scattergl',
+            'x': times[idx] if datetimes is None else datetimes[idx],
+            'y': values[idx, i],
+            'mode': 'lines',
+            'name': name,
+            'xaxis': 'x' + axis_id * (display_mode != 'overlap'),
+            'yaxis': 'y' + axis_id
+        })
 
-    return dcc.Graph(figure=figure, id='graph-daq')
+    # Fetch the layout corresponding to the display parameters. The figure is
+    # passed as a plain dictionary, which skips the plotly schema validation
+    layout = graph_layout(display_mode, tuple(keys), datetimes is not None)
+    return {'data': traces, 'layout': layout}
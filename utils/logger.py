@@ -33,8 +33,7 @@ class CSVData:
         self._dict = {}
 
     def record(self, keys, vals):
-        for i, key in enumerate(keys):
-            self._dict[key] = vals[i]
+        self._dict.update(zip(keys, vals))
 
     def write(self):
         if self._str is None:
@@ -45,7 +44,7 @@ class CSVData:
                     self._fout.write(',')
                     self._str += ','
                 self._fout.write(key)
-                self._str+='{:f}' if key is not 'datetime' else '{}'
+                self._str+='{:f}' if key != 'datetime' else '{}'
             self._fout.write('\n')
             self._str+='\n'
 
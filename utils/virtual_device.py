@@ -1,5 +1,34 @@
 import os
-import pandas as pd
+import time
+
+def read_last_row(dev_file):
+    """
+    Reads the keys and the last row of values of a device file.
+    Raises if the last row does not match the keys (torn file)
+    """
+    with open(dev_file, 'r') as file:
+        lines = file.read().splitlines()
+    keys, values = lines[0].split(','), lines[-1].split(',')
+    if len(values) != len(keys):
+        raise ValueError('The last row of {} has {} values for {} keys'.\
+                format(dev_file, len(values), len(keys)))
+
+    return keys, values
+
+def write_value(dev_file, name, value):
+    """
+    Replaces the value of a quantity in the last row of a device file. The
+    new content is written to a hidden file and moved over the device file,
+    so that a concurrent reader never sees a partially written file
+    """
+    keys, values = read_last_row(dev_file)
+    values[keys.index(name)] = repr(float(value))
+
+    dev_dir, dev_name = os.path.split(dev_file)
+    tmp_file = os.path.join(dev_dir, '.{}.{}'.format(dev_name, os.getpid()))
+    with open(tmp_file, 'w') as file:
+        file.write(','.join(keys)+'\n'+','.join(values)+'\n')
+    os.replace(tmp_file, dev_file)
 
 class VirtualDevice(object):
     def __init__(self, dev_name, meas_keys):
@@ -19,6 +48,10 @@ class VirtualDevice(object):
         # Initialize the device measurement keys, names, units and initial values
         self._meas_vals = {key:0. for key in meas_keys}
 
+        # Initialize the cache of the last parsed file content
+        self._file_signature = None
+        self._file_vals      = None
+
         # Write the keys and the initial value to a file
         with open(self._dev_file, 'w+') as file:
             val_string = ''
@@ -32,6 +65,24 @@ class VirtualDevice(object):
             val_string += '\n'
             file.write(val_string.format(*self._meas_vals.values()))
 
+    def _read(self):
+        """
+        Reads the last values stored in the device file, only
+        parses it again if it has changed since the last read
+        """
+        # Check the file size and modification time against the last read
+        stat = os.stat(self._dev_file)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._file_signature:
+            keys, values = read_last_row(self._dev_file)
+            self._file_vals = dict(zip(keys, map(float, values)))
+
+            # Do not trust a file modified within the timestamp granularity
+            recent = time.time_ns() - stat.st_mtime_ns < 1e9
+            self._file_signature = signature if not recent else None
+
+        return self._file_vals
+
     def get_update(self, name):
         """
         Fetches a measurement, updates the last value
@@ -41,9 +92,8 @@ class VirtualDevice(object):
         if name not in self._meas_vals.keys():
             raise KeyError('The VirtualDevice does not contain a value for {}'.format(name))
 
-        # Open the file, get the last entry in the relevant key
-        df = pd.read_csv(self._dev_file)
-        value = float(df[name].iloc[-1])
+        # Get the last entry in the relevant key, reread the file if it changed
+        value = self._read()[name]
         updated = False
         if value != self._meas_vals[name]:
             self._meas_vals[name] = value
@@ -58,9 +108,8 @@ class VirtualDevice(object):
         if name not in self._meas_vals.keys():
             raise KeyError('The VirtualDevice does not contain a value for {}'.format(name))
 
-        # Open the file, get the last entry in the relevant key
-        df = pd.read_csv(self._dev_file)
-        return float(df[name].iloc[-1])
+        # Get the last entry in the relevant key, reread the file if it changed
+        return self._read()[name]
 
     def set(self, name, value):
         """
@@ -72,7 +121,5 @@ class VirtualDevice(object):
 
         # Only write if the value is different from the last
         if value != self._meas_vals[name]:
-            df = pd.read_csv(self._dev_file)
-            df[name].iloc[-1] = value
-            df.to_csv(self._dev_file, index=False)
+            write_value(self._dev_file, name, value)
             self._meas_vals[name] = value